@@ -1,15 +1,19 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import numpy as np
 from datetime import datetime, timedelta
 import folium
-from streamlit_folium import st_folium
 import base64
 from io import BytesIO
 
+# Serialize chart payloads with orjson instead of the stdlib json encoder
+pio.json.config.default_engine = 'orjson'
+
 # Page configuration
 st.set_page_config(
     page_title="AVDP Climate-Smart Agriculture Dashboard",
@@ -57,58 +61,62 @@ st.markdown("""
 @st.cache_data
 def generate_sample_data():
     """Generate comprehensive sample data for the dashboard"""
+    rng = np.random.default_rng(42)
     
     # Districts in Sierra Leone
     districts = ['Western Area', 'Bo', 'Kenema', 'Kailahun', 'Kono', 'Bombali', 'Tonkolili', 'Port Loko']
     
+    years = np.arange(2020, 2025)
+    n_rows = len(districts) * len(years)
+    
     # IVS Rice Data
-    ivs_data = []
-    for district in districts:
-        for year in range(2020, 2025):
-            ivs_data.append({
-                'District': district,
-                'Year': year,
-                'Hectares_Developed': np.random.randint(50, 200),
-                'Farmers_Count': np.random.randint(100, 500),
-                'Women_Farmers': np.random.randint(40, 200),
-                'Youth_Farmers': np.random.randint(20, 100),
-                'CSA_Adoption_Rate': np.random.uniform(0.3, 0.9),
-                'Yield_Traditional': np.random.uniform(2.0, 3.5),
-                'Yield_CSA': np.random.uniform(3.5, 6.0),
-                'Income_Before': np.random.uniform(500, 1200),
-                'Income_After': np.random.uniform(800, 2000)
-            })
+    ivs_data = pd.DataFrame({
+        'District': pd.Categorical(
+            np.repeat(districts, len(years)), categories=districts, ordered=True
+        ),
+        'Year': np.tile(years, len(districts)),
+        'Hectares_Developed': rng.integers(50, 200, size=n_rows),
+        'Farmers_Count': rng.integers(100, 500, size=n_rows),
+        'Women_Farmers': rng.integers(40, 200, size=n_rows),
+        'Youth_Farmers': rng.integers(20, 100, size=n_rows),
+        'CSA_Adoption_Rate': rng.uniform(0.3, 0.9, size=n_rows),
+        'Yield_Traditional': rng.uniform(2.0, 3.5, size=n_rows),
+        'Yield_CSA': rng.uniform(3.5, 6.0, size=n_rows),
+        'Income_Before': rng.uniform(500, 1200, size=n_rows),
+        'Income_After': rng.uniform(800, 2000, size=n_rows)
+    })
     
     # Tree Crops Data
-    tree_data = []
-    for district in districts:
-        for year in range(2020, 2025):
-            tree_data.append({
-                'District': district,
-                'Year': year,
-                'Cocoa_Seedlings': np.random.randint(1000, 5000),
-                'Oil_Palm_Seedlings': np.random.randint(500, 3000),
-                'Survival_Rate_Year2': np.random.uniform(0.7, 0.95),
-                'Farmers_Trained': np.random.randint(50, 300),
-                'Income_Change': np.random.uniform(200, 800)
-            })
+    tree_data = pd.DataFrame({
+        'District': pd.Categorical(
+            np.repeat(districts, len(years)), categories=districts, ordered=True
+        ),
+        'Year': np.tile(years, len(districts)),
+        'Cocoa_Seedlings': rng.integers(1000, 5000, size=n_rows),
+        'Oil_Palm_Seedlings': rng.integers(500, 3000, size=n_rows),
+        'Survival_Rate_Year2': rng.uniform(0.7, 0.95, size=n_rows),
+        'Farmers_Trained': rng.integers(50, 300, size=n_rows),
+        'Income_Change': rng.uniform(200, 800, size=n_rows)
+    })
     
     # Vegetable Data
-    veg_data = []
     csa_techniques = ['Raised Beds', 'Mulching', 'Drip Irrigation', 'Composting', 'Intercropping']
-    for district in districts:
-        for technique in csa_techniques:
-            veg_data.append({
-                'District': district,
-                'CSA_Technique': technique,
-                'Farmers_Supported': np.random.randint(20, 150),
-                'Onion_Yield_Increase': np.random.uniform(0.2, 0.8),
-                'Pepper_Yield_Increase': np.random.uniform(0.15, 0.6),
-                'Price_Premium': np.random.uniform(0.1, 0.4),
-                'Women_Participation': np.random.uniform(0.6, 0.9)
-            })
+    n_veg_rows = len(districts) * len(csa_techniques)
+    veg_data = pd.DataFrame({
+        'District': pd.Categorical(
+            np.repeat(districts, len(csa_techniques)), categories=districts, ordered=True
+        ),
+        'CSA_Technique': pd.Categorical(
+            np.tile(csa_techniques, len(districts)), categories=csa_techniques, ordered=True
+        ),
+        'Farmers_Supported': rng.integers(20, 150, size=n_veg_rows),
+        'Onion_Yield_Increase': rng.uniform(0.2, 0.8, size=n_veg_rows),
+        'Pepper_Yield_Increase': rng.uniform(0.15, 0.6, size=n_veg_rows),
+        'Price_Premium': rng.uniform(0.1, 0.4, size=n_veg_rows),
+        'Women_Participation': rng.uniform(0.6, 0.9, size=n_veg_rows)
+    })
     
-    return pd.DataFrame(ivs_data), pd.DataFrame(tree_data), pd.DataFrame(veg_data)
+    return ivs_data, tree_data, veg_data
 
 @st.cache_data
 def create_sustainability_scores():
@@ -118,21 +126,156 @@ def create_sustainability_scores():
         'Mulching', 'Agroforestry', 'Drip Irrigation', 'Intercropping'
     ]
     
-    scores_data = []
-    for practice in practices:
-        scores_data.append({
-            'Practice': practice,
-            'Climate_Resilience': np.random.uniform(3.5, 5.0),
-            'Scalability': np.random.uniform(3.0, 5.0),
-            'Cost_Effectiveness': np.random.uniform(3.2, 4.8),
-            'Farmer_Adoption': np.random.uniform(3.0, 4.5)
-        })
+    rng = np.random.default_rng(42)
+    n_practices = len(practices)
+    
+    scores_data = {
+        'Practice': practices,
+        'Climate_Resilience': rng.uniform(3.5, 5.0, size=n_practices),
+        'Scalability': rng.uniform(3.0, 5.0, size=n_practices),
+        'Cost_Effectiveness': rng.uniform(3.2, 4.8, size=n_practices),
+        'Farmer_Adoption': rng.uniform(3.0, 4.5, size=n_practices)
+    }
     
     return pd.DataFrame(scores_data)
 
+@st.cache_data
+def get_filter_options():
+    """Sidebar filter choices taken from the sample data categories"""
+    ivs_df, _, veg_df = generate_sample_data()
+    return {
+        'districts': tuple(ivs_df['District'].cat.categories),
+        'csa_techniques': tuple(veg_df['CSA_Technique'].cat.categories)
+    }
+
+@st.cache_data
+def filter_frames(districts, years, csa_filter):
+    """Filter the sample data by the sidebar selections"""
+    ivs_df, tree_df, veg_df = generate_sample_data()
+    year_start, year_end = years
+    
+    ivs_years = ivs_df['Year'].to_numpy()
+    ivs_mask = (
+        ivs_df['District'].isin(districts).to_numpy()
+        & (ivs_years >= year_start)
+        & (ivs_years <= year_end)
+    )
+    
+    tree_years = tree_df['Year'].to_numpy()
+    tree_mask = (
+        tree_df['District'].isin(districts).to_numpy()
+        & (tree_years >= year_start)
+        & (tree_years <= year_end)
+    )
+    
+    veg_mask = veg_df['District'].isin(districts).to_numpy()
+    if csa_filter != 'All':
+        veg_mask = veg_mask & (veg_df['CSA_Technique'] == csa_filter).to_numpy()
+    
+    return ivs_df.loc[ivs_mask], tree_df.loc[tree_mask], veg_df.loc[veg_mask]
+
+# Traces longer than this are drawn with WebGL instead of SVG
+WEBGL_POINT_THRESHOLD = 5000
+
+def scatter_trace(x, y, **kwargs):
+    """Build a line/marker trace, switching to WebGL for long series"""
+    if len(x) > WEBGL_POINT_THRESHOLD:
+        return go.Scattergl(x=x, y=y, **kwargs)
+    return go.Scatter(x=x, y=y, **kwargs)
+
+@st.cache_data
+def compute_aggregates(filtered_ivs, filtered_tree, filtered_veg):
+    """Compute all grouped summaries used by the charts in one place"""
+    return {
+        'ivs_by_district': filtered_ivs[
+            ['District', 'CSA_Adoption_Rate', 'Farmers_Count', 'Hectares_Developed']
+        ].groupby('District', observed=True).agg(
+            CSA_Adoption_Rate=('CSA_Adoption_Rate', 'mean'),
+            Farmers_Count=('Farmers_Count', 'sum'),
+            Hectares_Developed=('Hectares_Developed', 'sum')
+        ),
+        'ivs_by_year': filtered_ivs[
+            ['Year', 'Yield_Traditional', 'Yield_CSA']
+        ].groupby('Year', observed=True).mean().reset_index(),
+        'tree_by_district': filtered_tree[
+            ['District', 'Survival_Rate_Year2', 'Income_Change']
+        ].groupby('District', observed=True).mean().reset_index(),
+        'veg_by_technique': filtered_veg[
+            ['CSA_Technique', 'Onion_Yield_Increase', 'Pepper_Yield_Increase']
+        ].groupby('CSA_Technique', observed=True).mean().reset_index(),
+        'veg_by_district': filtered_veg[
+            ['District', 'Women_Participation']
+        ].groupby('District', observed=True).mean().reset_index()
+    }
+
+@st.cache_data
+def build_tree_dual_fig(survival_income):
+    """Build the tree survival vs income figure as a plain dict"""
+    fig_dual = make_subplots(specs=[[{"secondary_y": True}]])
+    fig_dual.add_trace(
+        go.Bar(x=survival_income['District'], y=survival_income['Survival_Rate_Year2'], name="Survival Rate"),
+        secondary_y=False,
+    )
+    fig_dual.add_trace(
+        scatter_trace(survival_income['District'], survival_income['Income_Change'],
+                      mode='lines+markers', name="Income Change ($)", line=dict(color='orange')),
+        secondary_y=True,
+    )
+    fig_dual.update_xaxes(title_text="District")
+    fig_dual.update_yaxes(title_text="Survival Rate (%)", secondary_y=False)
+    fig_dual.update_yaxes(title_text="Income Change ($)", secondary_y=True)
+    fig_dual.update_layout(title="Tree Survival vs Income Impact")
+    
+    return fig_dual.to_dict()
+
+@st.cache_data
+def convert_df_to_csv(df):
+    """Encode a DataFrame as CSV bytes for download"""
+    return df.to_csv(index=False).encode('utf-8')
+
+@st.cache_data
+def build_map_html(districts, district_stats):
+    """Render the district activity map to standalone HTML"""
+    # Create a map centered on Sierra Leone
+    map_center = [8.4606, -11.7799]  # Sierra Leone coordinates
+    m = folium.Map(location=map_center, zoom_start=8)
+    
+    # Add markers for each district
+    district_coords = {
+        'Western Area': [8.4606, -11.7799],
+        'Bo': [7.9644, -11.7383],
+        'Kenema': [7.8767, -11.1896],
+        'Kailahun': [8.2814, -10.7307],
+        'Kono': [8.8786, -10.9719],
+        'Bombali': [9.2364, -12.1344],
+        'Tonkolili': [8.7336, -11.6924],
+        'Port Loko': [8.7658, -12.7876]
+    }
+    
+    district_markers = folium.FeatureGroup(name="AVDP Districts")
+    
+    for district in districts:
+        if district in district_coords and district in district_stats:
+            stats = district_stats[district]
+            
+            folium.Marker(
+                district_coords[district],
+                popup=f"""
+                <b>{district}</b><br>
+                Farmers: {int(stats['Farmers_Count']):,}<br>
+                Hectares: {int(stats['Hectares_Developed']):,}<br>
+                CSA Adoption: {stats['CSA_Adoption_Rate']:.1%}
+                """,
+                icon=folium.Icon(color='green', icon='leaf')
+            ).add_to(district_markers)
+    
+    district_markers.add_to(m)
+    
+    return m.get_root().render()
+
 # Data loading
-ivs_df, tree_df, veg_df = generate_sample_data()
 sustainability_df = create_sustainability_scores()
+filter_options = get_filter_options()
 
 # Header
 st.markdown("""
@@ -150,8 +293,8 @@ st.markdown("""
 st.sidebar.header("🎛️ Dashboard Filters")
 selected_districts = st.sidebar.multiselect(
     "Select Districts",
-    options=ivs_df['District'].unique(),
-    default=ivs_df['District'].unique()[:3]
+    options=filter_options['districts'],
+    default=filter_options['districts'][:3]
 )
 
 selected_years = st.sidebar.slider(
@@ -163,7 +306,7 @@ selected_years = st.sidebar.slider(
 
 csa_filter = st.sidebar.selectbox(
     "Filter by CSA Practice",
-    options=['All'] + list(veg_df['CSA_Technique'].unique())
+    options=('All',) + filter_options['csa_techniques']
 )
 
 gender_focus = st.sidebar.selectbox(
@@ -172,19 +315,11 @@ gender_focus = st.sidebar.selectbox(
 )
 
 # Filter data based on selections
-filtered_ivs = ivs_df[
-    (ivs_df['District'].isin(selected_districts)) &
-    (ivs_df['Year'].between(selected_years[0], selected_years[1]))
-]
-
-filtered_tree = tree_df[
-    (tree_df['District'].isin(selected_districts)) &
-    (tree_df['Year'].between(selected_years[0], selected_years[1]))
-]
-
-filtered_veg = veg_df[veg_df['District'].isin(selected_districts)]
-if csa_filter != 'All':
-    filtered_veg = filtered_veg[filtered_veg['CSA_Technique'] == csa_filter]
+filtered_ivs, filtered_tree, filtered_veg = filter_frames(
+    tuple(sorted(selected_districts)), tuple(selected_years), csa_filter
+)
+aggregates = compute_aggregates(filtered_ivs, filtered_tree, filtered_veg)
+ivs_by_district = aggregates['ivs_by_district']
 
 # Key Performance Indicators
 st.header("📊 Key Performance Indicators")
@@ -192,7 +327,7 @@ st.header("📊 Key Performance Indicators")
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
-    total_hectares = filtered_ivs['Hectares_Developed'].sum()
+    total_hectares = filtered_ivs['Hectares_Developed'].to_numpy().sum()
     st.metric(
         label="Total Hectares Developed (IVS)",
         value=f"{total_hectares:,}",
@@ -200,7 +335,7 @@ with col1:
     )
 
 with col2:
-    total_farmers = filtered_ivs['Farmers_Count'].sum()
+    total_farmers = filtered_ivs['Farmers_Count'].to_numpy().sum()
     st.metric(
         label="Farmers Reached",
         value=f"{total_farmers:,}",
@@ -208,7 +343,7 @@ with col2:
     )
 
 with col3:
-    avg_csa_adoption = filtered_ivs['CSA_Adoption_Rate'].mean()
+    avg_csa_adoption = filtered_ivs['CSA_Adoption_Rate'].to_numpy().mean()
     st.metric(
         label="CSA Adoption Rate",
         value=f"{avg_csa_adoption:.1%}",
@@ -216,7 +351,7 @@ with col3:
     )
 
 with col4:
-    total_seedlings = filtered_tree['Cocoa_Seedlings'].sum() + filtered_tree['Oil_Palm_Seedlings'].sum()
+    total_seedlings = filtered_tree['Cocoa_Seedlings'].to_numpy().sum() + filtered_tree['Oil_Palm_Seedlings'].to_numpy().sum()
     st.metric(
         label="Tree Seedlings Distributed",
         value=f"{total_seedlings:,}",
@@ -233,7 +368,7 @@ col1, col2 = st.columns(2)
 
 with col1:
     # CSA Adoption by District
-    district_csa = filtered_ivs.groupby('District')['CSA_Adoption_Rate'].mean().reset_index()
+    district_csa = ivs_by_district[['CSA_Adoption_Rate']].reset_index()
     fig_csa = px.bar(
         district_csa,
         x='District',
@@ -247,18 +382,18 @@ with col1:
 
 with col2:
     # Yield Comparison
-    yield_comparison = filtered_ivs.groupby('Year')[['Yield_Traditional', 'Yield_CSA']].mean().reset_index()
+    yield_comparison = aggregates['ivs_by_year']
     fig_yield = go.Figure()
-    fig_yield.add_trace(go.Scatter(
-        x=yield_comparison['Year'],
-        y=yield_comparison['Yield_Traditional'],
+    fig_yield.add_trace(scatter_trace(
+        yield_comparison['Year'],
+        yield_comparison['Yield_Traditional'],
         mode='lines+markers',
         name='Traditional Farming',
         line=dict(color='red', dash='dash')
     ))
-    fig_yield.add_trace(go.Scatter(
-        x=yield_comparison['Year'],
-        y=yield_comparison['Yield_CSA'],
+    fig_yield.add_trace(scatter_trace(
+        yield_comparison['Year'],
+        yield_comparison['Yield_CSA'],
         mode='lines+markers',
         name='CSA Farming',
         line=dict(color='green')
@@ -284,8 +419,8 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Seedling Distribution
-    total_cocoa = filtered_tree['Cocoa_Seedlings'].sum()
-    total_palm = filtered_tree['Oil_Palm_Seedlings'].sum()
+    total_cocoa = filtered_tree['Cocoa_Seedlings'].to_numpy().sum()
+    total_palm = filtered_tree['Oil_Palm_Seedlings'].to_numpy().sum()
     
     fig_donut = go.Figure(data=[go.Pie(
         labels=['Cocoa', 'Oil Palm'],
@@ -300,22 +435,9 @@ with col1:
 
 with col2:
     # Survival Rate and Income Change
-    survival_income = filtered_tree.groupby('District')[['Survival_Rate_Year2', 'Income_Change']].mean().reset_index()
+    survival_income = aggregates['tree_by_district']
     
-    fig_dual = make_subplots(specs=[[{"secondary_y": True}]])
-    fig_dual.add_trace(
-        go.Bar(x=survival_income['District'], y=survival_income['Survival_Rate_Year2'], name="Survival Rate"),
-        secondary_y=False,
-    )
-    fig_dual.add_trace(
-        go.Scatter(x=survival_income['District'], y=survival_income['Income_Change'], 
-                  mode='lines+markers', name="Income Change ($)", line=dict(color='orange')),
-        secondary_y=True,
-    )
-    fig_dual.update_xaxes(title_text="District")
-    fig_dual.update_yaxes(title_text="Survival Rate (%)", secondary_y=False)
-    fig_dual.update_yaxes(title_text="Income Change ($)", secondary_y=True)
-    fig_dual.update_layout(title="Tree Survival vs Income Impact")
+    fig_dual = go.Figure(build_tree_dual_fig(survival_income))
     st.plotly_chart(fig_dual, use_container_width=True)
 
 # Tree Crops Testimonial
@@ -332,7 +454,7 @@ col1, col2 = st.columns(2)
 
 with col1:
     # Yield Increase by CSA Technique
-    technique_yield = filtered_veg.groupby('CSA_Technique')[['Onion_Yield_Increase', 'Pepper_Yield_Increase']].mean().reset_index()
+    technique_yield = aggregates['veg_by_technique']
     
     fig_yield_tech = go.Figure()
     fig_yield_tech.add_trace(go.Bar(
@@ -359,7 +481,7 @@ with col1:
 
 with col2:
     # Gender Participation in Vegetable Farming
-    gender_participation = filtered_veg.groupby('District')['Women_Participation'].mean().reset_index()
+    gender_participation = aggregates['veg_by_district']
     
     fig_gender = px.pie(
         values=[gender_participation['Women_Participation'].mean(), 
@@ -373,40 +495,9 @@ with col2:
 # Interactive Map
 st.header("🗺️ Geographic Distribution of AVDP Activities")
 
-# Create a map centered on Sierra Leone
-map_center = [8.4606, -11.7799]  # Sierra Leone coordinates
-m = folium.Map(location=map_center, zoom_start=8)
-
-# Add markers for each district
-district_coords = {
-    'Western Area': [8.4606, -11.7799],
-    'Bo': [7.9644, -11.7383],
-    'Kenema': [7.8767, -11.1896],
-    'Kailahun': [8.2814, -10.7307],
-    'Kono': [8.8786, -10.9719],
-    'Bombali': [9.2364, -12.1344],
-    'Tonkolili': [8.7336, -11.6924],
-    'Port Loko': [8.7658, -12.7876]
-}
-
-for district in selected_districts:
-    if district in district_coords:
-        district_data = filtered_ivs[filtered_ivs['District'] == district]
-        total_farmers = district_data['Farmers_Count'].sum()
-        total_hectares = district_data['Hectares_Developed'].sum()
-        
-        folium.Marker(
-            district_coords[district],
-            popup=f"""
-            <b>{district}</b><br>
-            Farmers: {total_farmers:,}<br>
-            Hectares: {total_hectares:,}<br>
-            CSA Adoption: {district_data['CSA_Adoption_Rate'].mean():.1%}
-            """,
-            icon=folium.Icon(color='green', icon='leaf')
-        ).add_to(m)
-
-map_data = st_folium(m, width=700, height=500)
+district_stats = ivs_by_district.to_dict('index')
+map_html = build_map_html(tuple(sorted(selected_districts)), district_stats)
+components.html(map_html, height=500)
 
 # Sustainability Scorecard
 st.header("🌱 CSA Practice Sustainability Scorecard")
@@ -416,17 +507,13 @@ fig_radar = go.Figure()
 
 categories = ['Climate Resilience', 'Scalability', 'Cost Effectiveness', 'Farmer Adoption']
 
-for practice in sustainability_df['Practice'].head(5):  # Show top 5 practices
-    practice_data = sustainability_df[sustainability_df['Practice'] == practice]
-    values = [
-        practice_data['Climate_Resilience'].iloc[0],
-        practice_data['Scalability'].iloc[0],
-        practice_data['Cost_Effectiveness'].iloc[0],
-        practice_data['Farmer_Adoption'].iloc[0]
-    ]
-    
+score_columns = ['Climate_Resilience', 'Scalability', 'Cost_Effectiveness', 'Farmer_Adoption']
+top_practices = sustainability_df.head(5)  # Show top 5 practices
+score_values = top_practices[score_columns].to_numpy()
+
+for practice, values in zip(top_practices['Practice'], score_values):
     fig_radar.add_trace(go.Scatterpolar(
-        r=values,
+        r=values.tolist(),
         theta=categories,
         fill='toself',
         name=practice
@@ -485,7 +572,7 @@ st.header("📥 Data Export")
 col1, col2, col3 = st.columns(3)
 
 with col1:
-    csv_ivs = filtered_ivs.to_csv(index=False)
+    csv_ivs = convert_df_to_csv(filtered_ivs)
     st.download_button(
         label="Download IVS Rice Data",
         data=csv_ivs,
@@ -494,7 +581,7 @@ with col1:
     )
 
 with col2:
-    csv_tree = filtered_tree.to_csv(index=False)
+    csv_tree = convert_df_to_csv(filtered_tree)
     st.download_button(
         label="Download Tree Crops Data",
         data=csv_tree,
@@ -503,7 +590,7 @@ with col2:
     )
 
 with col3:
-    csv_veg = filtered_veg.to_csv(index=False)
+    csv_veg = convert_df_to_csv(filtered_veg)
     st.download_button(
         label="Download Vegetable Data",
         data=csv_veg,